@@ -1,18 +1,30 @@
+from __future__ import annotations
+
 import click
 import llm # Main LLM library
 import subprocess # For running git commands
-from prompt_toolkit import PromptSession # For interactive editing
-from prompt_toolkit.patch_stdout import patch_stdout # Important for prompt_toolkit
-from prompt_toolkit.formatted_text import FormattedText
-from prompt_toolkit.shortcuts import print_formatted_text
-from prompt_toolkit.styles import Style
-from prompt_toolkit.key_binding import KeyBindings
 import os
 import json
+import functools
+import re
 import tempfile
 import shutil
+import contextlib
+import io
+from dataclasses import dataclass, field
 from importlib import resources
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+# prompt_toolkit is imported lazily inside the interactive helpers, so that
+# --list-prompts, config, -y and external-editor runs don't pay for it.
+if TYPE_CHECKING:
+    from prompt_toolkit.styles import Style
+
+try:
+    import orjson # Optional: faster config parsing/serialization
+except ImportError:
+    orjson = None
 
 # ---  Configuration Management ---
 # This section handles loading and saving configuration.
@@ -31,22 +43,47 @@ BUILTIN_PROMPT_STYLES = {
     "gitmoji": "Gitmoji-style with emoji prefixes",
     "custom": "Editable custom prompt - edit prompts/custom.txt to customize",
 }
+# For membership tests only; iterate BUILTIN_PROMPT_STYLES to keep display order
+_BUILTIN_STYLE_NAMES = frozenset(BUILTIN_PROMPT_STYLES)
+
+
+# Marker written once every built-in prompt has been copied; bump the
+# version when new built-in styles are added so they get installed too.
+PROMPTS_INSTALLED_MARKER = ".installed_v1"
+_PROMPTS_READY = False # Set once installation has been verified in this process
 
 
 def ensure_prompts_installed():
     """Ensure prompt files are installed to the config directory."""
-    if not PROMPTS_DIR.exists():
-        PROMPTS_DIR.mkdir(parents=True, exist_ok=True)
+    global _PROMPTS_READY
+    if _PROMPTS_READY:
+        return
+
+    marker_file = PROMPTS_DIR / PROMPTS_INSTALLED_MARKER
+    if marker_file.exists():
+        _PROMPTS_READY = True
+        return
+
+    PROMPTS_DIR.mkdir(parents=True, exist_ok=True)
 
     # Copy prompts from package to config directory if they don't exist
     try:
+        installed = set(os.listdir(PROMPTS_DIR))
         package_prompts = resources.files("llm_git_commit").joinpath("prompts")
         for style_name in BUILTIN_PROMPT_STYLES:
-            dest_file = PROMPTS_DIR / f"{style_name}.txt"
-            if not dest_file.exists():
-                source_file = package_prompts.joinpath(f"{style_name}.txt")
-                if source_file.is_file():
-                    dest_file.write_text(source_file.read_text())
+            file_name = f"{style_name}.txt"
+            if file_name in installed:
+                continue
+            source_file = package_prompts.joinpath(file_name)
+            if source_file.is_file():
+                dest_file = PROMPTS_DIR / file_name
+                temp_file = PROMPTS_DIR / f"{file_name}.tmp"
+                # Copy at the byte level, then rename so a partial file is never visible
+                with resources.as_file(source_file) as source_path:
+                    shutil.copyfile(source_path, temp_file)
+                os.replace(temp_file, dest_file)
+        marker_file.touch()
+        _PROMPTS_READY = True
     except Exception:
         # If package resources aren't available, that's okay - user can create their own
         pass
@@ -54,58 +91,80 @@ def ensure_prompts_installed():
 
 def load_config():
     """Loads configuration from the JSON file."""
-    if not CONFIG_FILE.exists():
-        return {}
     try:
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
+        raw = CONFIG_FILE.read_bytes()
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
+    except (ValueError, OSError): # JSON decode errors subclass ValueError
         return {}
 
 
 def save_config(config_data):
     """Saves configuration to the JSON file."""
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config_data, f, indent=2)
+    if orjson is not None:
+        CONFIG_FILE.write_bytes(orjson.dumps(config_data, option=orjson.OPT_INDENT_2))
+    else:
+        CONFIG_FILE.write_text(json.dumps(config_data, indent=2))
 
 
+@functools.lru_cache(maxsize=None)
 def get_prompt_content(prompt_name: str) -> str | None:
     """Load prompt content from file in config directory.
 
-    Returns the prompt text, or None if not found.
+    Returns the prompt text, or None if not found. Results are cached for
+    the lifetime of the process.
     """
     prompt_file = PROMPTS_DIR / f"{prompt_name}.txt"
     if prompt_file.exists():
-        return prompt_file.read_text().strip()
+        return prompt_file.read_bytes().decode("utf-8", errors="replace").strip()
 
     # Fall back to package resources
     try:
         package_prompts = resources.files("llm_git_commit").joinpath("prompts")
         source_file = package_prompts.joinpath(f"{prompt_name}.txt")
         if source_file.is_file():
-            return source_file.read_text().strip()
+            return source_file.read_bytes().decode("utf-8", errors="replace").strip()
     except Exception:
         pass
 
     return None
 
 
+@functools.lru_cache(maxsize=None)
+def _package_has_prompt(prompt_name: str) -> bool:
+    """Check whether a prompt ships with the package."""
+    try:
+        return resources.files("llm_git_commit").joinpath("prompts", f"{prompt_name}.txt").is_file()
+    except Exception:
+        return False
+
+
+def _prompt_exists(prompt_name: str) -> bool:
+    """Check for a prompt file without reading it."""
+    return (PROMPTS_DIR / f"{prompt_name}.txt").exists() or _package_has_prompt(prompt_name)
+
+
+@functools.lru_cache(maxsize=None)
 def list_available_prompts() -> dict[str, str]:
-    """List all available prompt styles with descriptions."""
-    available = {}
+    """List all available prompt styles with descriptions.
 
-    # Start with built-in styles
-    for name, desc in BUILTIN_PROMPT_STYLES.items():
-        if get_prompt_content(name):
-            available[name] = desc
+    The result is cached; callers must not mutate the returned dict.
+    """
+    # One directory scan gives us every prompt file on disk
+    try:
+        with os.scandir(PROMPTS_DIR) as it:
+            on_disk = {entry.name[:-4] for entry in it if entry.name.endswith(".txt") and entry.is_file()}
+    except OSError:
+        on_disk = set()
+
+    # Start with built-in styles; only fall back to package resources for ones missing on disk
+    available = {name: desc for name, desc in BUILTIN_PROMPT_STYLES.items()
+                 if name in on_disk or get_prompt_content(name)}
 
     # Add any custom prompts in the prompts directory
-    if PROMPTS_DIR.exists():
-        for prompt_file in PROMPTS_DIR.glob("*.txt"):
-            name = prompt_file.stem
-            if name not in available:
-                available[name] = f"Custom prompt: {name}"
+    available.update({name: f"Custom prompt: {name}" for name in sorted(on_disk - _BUILTIN_STYLE_NAMES)})
 
     return available
 
@@ -127,6 +186,15 @@ def get_system_prompt(config: dict, prompt_style_override: str | None = None, sy
 
     Prompts are loaded from text files in ~/.config/llm-git-commit/prompts/
     """
+    return _cached_get_system_prompt(
+        system_override, prompt_style_override, config.get("prompt"), config.get("prompt-style")
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_get_system_prompt(system_override: str | None, prompt_style_override: str | None,
+                              config_prompt: str | None, config_style: str | None) -> str:
+    """Resolve the system prompt; memoized on the inputs that affect it."""
     # Explicit system prompt override (from -s flag)
     if system_override:
         return system_override
@@ -140,14 +208,12 @@ def get_system_prompt(config: dict, prompt_style_override: str | None = None, sy
                         f"Create {PROMPTS_DIR / prompt_style_override}.txt or use --list-prompts")
 
     # Config-based prompt (a style name like "conventional", "custom", etc.)
-    config_prompt = config.get("prompt")
     if config_prompt:
         content = get_prompt_content(config_prompt)
         if content:
             return content
 
     # Legacy: check for old "prompt-style" key
-    config_style = config.get("prompt-style")
     if config_style:
         content = get_prompt_content(config_style)
         if content:
@@ -162,17 +228,132 @@ def get_system_prompt(config: dict, prompt_style_override: str | None = None, sy
     return DEFAULT_GIT_COMMIT_SYSTEM_PROMPT
 
 
+# --- Git Context ---
+# Facts about the surrounding repository, gathered with a single git process
+# at command entry and passed down to the helpers that need them.
+
+@functools.lru_cache(maxsize=None)
+def _git_executable() -> str:
+    """Absolute path to git, falling back to plain "git" if it isn't on PATH.
+
+    subprocess only takes its posix_spawn fast path when the executable has
+    a directory component, so git calls use this rather than a bare name.
+    """
+    return shutil.which("git") or "git"
+
+
+@functools.lru_cache(maxsize=None)
+def _git_env() -> dict[str, str]:
+    """Environment for git subprocesses.
+
+    GIT_OPTIONAL_LOCKS=0 stops read-only commands such as ``status`` from
+    taking the index lock just to refresh its stat cache.
+    """
+    return {**os.environ, "GIT_OPTIONAL_LOCKS": "0"}
+
+
+def _git_run(args: list[str], **kwargs) -> subprocess.CompletedProcess:
+    """Run ``git <args>`` via subprocess.run.
+
+    close_fds=False lets subprocess use posix_spawn instead of fork+exec
+    on Python < 3.13; this process holds no descriptors git shouldn't see.
+    """
+    return subprocess.run([_git_executable(), *args], close_fds=False, env=_git_env(), **kwargs)
+
+
+@dataclass(eq=False)
+class GitContext:
+    """Repository state probed once per invocation.
+
+    ``core.editor`` is only looked up on first use, since most
+    invocations never open an external editor. Instances compare and hash
+    by identity so they can key memoized helpers.
+    """
+    inside_work_tree: bool
+    toplevel: str | None = None
+    git_dir: str | None = None
+    cdup: str | None = None # Path from cwd up to the toplevel ("" when at the top)
+    _core_editor: str | None = field(default=None, repr=False)
+    _core_editor_loaded: bool = field(default=False, repr=False)
+
+    @property
+    def core_editor(self) -> str | None:
+        """The value of ``git config core.editor``, or None if unset."""
+        if not self._core_editor_loaded:
+            self._core_editor = _read_git_core_editor()
+            self._core_editor_loaded = True
+        return self._core_editor
+
+    @property
+    def at_toplevel(self) -> bool:
+        """Whether the command is running from the repository's top level."""
+        return self.cdup == ""
+
+
+# Probe results per working directory; the answer is stable for the process lifetime
+_GIT_CONTEXT_CACHE: dict[str, GitContext] = {}
+
+
+def _probe_git_context() -> GitContext:
+    """Collect repository facts with one multi-flag ``git rev-parse`` call.
+
+    Results are memoized per working directory, so repeated probes in one
+    process don't re-run git.
+    """
+    cwd = os.getcwd()
+    cached = _GIT_CONTEXT_CACHE.get(cwd)
+    if cached is None:
+        cached = _GIT_CONTEXT_CACHE[cwd] = _run_git_probe()
+    return cached
+
+
+def _run_git_probe() -> GitContext:
+    """Run the ``git rev-parse`` probe for the current directory."""
+    try:
+        result = _git_run(
+            ["rev-parse", "--is-inside-work-tree", "--show-toplevel", "--git-dir", "--show-cdup"],
+            capture_output=True, text=True, check=False,
+            encoding="utf-8", errors="ignore"
+        )
+    except FileNotFoundError:
+        return GitContext(inside_work_tree=False)
+
+    lines = result.stdout.splitlines()
+    if result.returncode != 0 or len(lines) < 4 or lines[0] != "true":
+        return GitContext(inside_work_tree=False)
+    return GitContext(inside_work_tree=True, toplevel=lines[1], git_dir=lines[2], cdup=lines[3])
+
+
+def _read_git_core_editor() -> str | None:
+    """Read ``git config core.editor``, returning None if unset."""
+    try:
+        result = _git_run(
+            ["config", "core.editor"],
+            capture_output=True, text=True, check=False
+        )
+        if result.returncode == 0 and result.stdout.strip():
+            return result.stdout.strip()
+    except FileNotFoundError:
+        pass
+    return None
+
+
 # --- Editor Configuration ---
 # Editor modes:
 #   "internal" (default) - use built-in prompt_toolkit editor
 #   "env" - detect from environment (LLM_GIT_COMMIT_EDITOR > git config > VISUAL > EDITOR)
 #   "<command>" - use specific editor command (e.g., "vim", "code --wait")
 
-def get_editor_from_env() -> str | None:
+@functools.lru_cache(maxsize=None)
+def get_editor_from_env(git_ctx: GitContext | None = None) -> str | None:
     """Get editor from environment variables.
 
     Priority: LLM_GIT_COMMIT_EDITOR > git config core.editor > VISUAL > EDITOR
     Returns None if no editor is found.
+
+    If a GitContext is given, its cached core.editor value is used instead
+    of spawning another git process. The result is memoized, as neither the
+    environment nor git config changes during a run.
     """
     # Check LLM_GIT_COMMIT_EDITOR first
     editor = os.environ.get("LLM_GIT_COMMIT_EDITOR")
@@ -180,26 +361,22 @@ def get_editor_from_env() -> str | None:
         return editor
 
     # Check git config core.editor
-    try:
-        result = subprocess.run(
-            ["git", "config", "core.editor"],
-            capture_output=True, text=True, check=False
-        )
-        if result.returncode == 0 and result.stdout.strip():
-            return result.stdout.strip()
-    except FileNotFoundError:
-        pass
+    git_editor = git_ctx.core_editor if git_ctx is not None else _read_git_core_editor()
+    if git_editor:
+        return git_editor
 
     # Fall back to standard editor environment variables
     return os.environ.get("VISUAL") or os.environ.get("EDITOR")
 
 
-def resolve_editor(config: dict, use_external_flag: bool = False) -> tuple[str, str | None]:
+def resolve_editor(config: dict, use_external_flag: bool = False,
+                   git_ctx: GitContext | None = None) -> tuple[str, str | None]:
     """Resolve which editor to use based on config and flags.
 
     Args:
         config: Configuration dict
         use_external_flag: Whether -e/--editor flag was passed without value
+        git_ctx: Probed repository context, reused for the core.editor lookup
 
     Returns:
         Tuple of (mode, editor_command):
@@ -217,7 +394,7 @@ def resolve_editor(config: dict, use_external_flag: bool = False) -> tuple[str,
         return ("internal", None)
 
     if editor_config == "env":
-        env_editor = get_editor_from_env()
+        env_editor = get_editor_from_env(git_ctx)
         if env_editor:
             return ("env", env_editor)
         # No env editor found, fall back to internal
@@ -227,6 +404,24 @@ def resolve_editor(config: dict, use_external_flag: bool = False) -> tuple[str,
     return ("command", editor_config)
 
 
+# Matches a whole '#' comment line (and its newline) in an edited message
+_COMMENT_RE = re.compile(r'(?m)^#[^\n]*\n?')
+
+
+def _editor_temp_dir() -> str | None:
+    """Directory for the editor's temp file.
+
+    A temp dir the user picked ($TMPDIR, $TEMP or $TMP) wins, resolved the
+    way tempfile does; otherwise /dev/shm if usable. Returns None to let
+    tempfile choose its default location.
+    """
+    if any(os.environ.get(name) for name in ("TMPDIR", "TEMP", "TMP")):
+        return tempfile.gettempdir()
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return None
+
+
 def edit_with_external_editor(initial_text: str, editor: str) -> str | None:
     """Open an external editor to edit the commit message.
 
@@ -239,34 +434,31 @@ def edit_with_external_editor(initial_text: str, editor: str) -> str | None:
 # Save and close the editor to proceed.
 # Leave the message empty to cancel the commit.
 """
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-        f.write(initial_text)
-        f.write("\n")
-        f.write(help_text)
+    payload = initial_text + "\n" + help_text
+    with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.txt', delete=False,
+                                     dir=_editor_temp_dir()) as f:
+        f.write(payload)
         temp_path = f.name
 
     try:
-        # Open the editor
-        result = subprocess.run([editor, temp_path], check=False)
+        # Open the editor; like _git_run, close_fds=False (with the resolved path) lets
+        # subprocess use posix_spawn instead of fork+exec on Python < 3.13
+        result = subprocess.run([shutil.which(editor) or editor, temp_path], check=False, close_fds=False)
         if result.returncode != 0:
             click.echo(click.style(f"Editor exited with code {result.returncode}", fg="yellow"))
             return None
 
         # Read the edited content
-        with open(temp_path, 'r') as f:
-            content = f.read()
+        content = Path(temp_path).read_bytes().decode("utf-8", errors="replace")
 
         # Strip comment lines and trailing whitespace
-        lines = [line for line in content.splitlines() if not line.startswith('#')]
-        edited_text = '\n'.join(lines).strip()
+        edited_text = _COMMENT_RE.sub('', content).strip()
 
         return edited_text if edited_text else None
     finally:
         # Clean up the temporary file
-        try:
+        with contextlib.suppress(OSError):
             os.unlink(temp_path)
-        except OSError:
-            pass
 
 
 # System Prompts for Chat Refinement
@@ -337,6 +529,11 @@ The system will use the text between the markers for user confirmation.
 
 PROPOSED_COMMIT_MARKER_START = "PROPOSED_COMMIT_MESSAGE_START"
 PROPOSED_COMMIT_MARKER_END = "PROPOSED_COMMIT_MESSAGE_END"
+# Group 1 is the proposal text between the first start marker and the next end marker, already stripped
+_MARKER_RE = re.compile(
+    re.escape(PROPOSED_COMMIT_MARKER_START) + r'\s*(.*?)\s*' + re.escape(PROPOSED_COMMIT_MARKER_END),
+    re.DOTALL
+)
 
 # --- LLM Plugin Hook ---
 @llm.hookimpl
@@ -373,8 +570,8 @@ def register_commands(cli):
         help="List available prompt styles and exit."
     )
     @click.option(
-        "--max-chars", "max_chars_override", type=int, default=None,
-        help="Set max characters for the diff sent to the LLM."
+        "--max-chars", "max_chars_override", type=click.IntRange(min=1), default=None,
+        help="Set max characters (UTF-8 bytes) for the diff sent to the LLM."
     )
     @click.option(
         "--key", "api_key_override", default=None,
@@ -392,7 +589,15 @@ def register_commands(cli):
         "--usage/--no-usage", "show_usage", default=None,
         help="Show token usage after LLM generation."
     )
-    def git_commit_command(ctx, diff_mode, model_id_override, system_prompt_override, prompt_style, list_prompts, max_chars_override, api_key_override, yes, editor_override, show_usage):
+    @click.option(
+        "--push/--no-push", "push", default=None,
+        help="Push (or don't) after a successful commit without asking."
+    )
+    @click.option(
+        "--status", "show_status", is_flag=True, default=False,
+        help="Show 'git status --short' after a successful commit."
+    )
+    def git_commit_command(ctx, diff_mode, model_id_override, system_prompt_override, prompt_style, list_prompts, max_chars_override, api_key_override, yes, editor_override, show_usage, push, show_status):
         """
         Generates Git commit messages using an LLM.
 
@@ -409,46 +614,83 @@ def register_commands(cli):
 
         # Handle --list-prompts
         if list_prompts:
-            click.echo("Available prompt styles:\n")
+            # Build the listing in one buffer and write it with a single echo
+            out = io.StringIO()
+            print("Available prompt styles:\n", file=out)
             current_prompt = config.get("prompt", DEFAULT_PROMPT_STYLE)
             for pid, desc in list_available_prompts().items():
                 marker = " (current)" if pid == current_prompt else ""
-                click.echo(f"  {click.style(pid, bold=True):20} {desc}{marker}")
-            click.echo(f"\nPrompt files location: {PROMPTS_DIR}")
-            click.echo("\nUsage: llm git-commit --prompt-style <style>")
-            click.echo("       llm git-commit config --prompt <style>  (set as default)")
+                print(f"  {click.style(pid, bold=True):20} {desc}{marker}", file=out)
+            print(f"\nPrompt files location: {PROMPTS_DIR}", file=out)
+            print("\nUsage: llm git-commit --prompt-style <style>", file=out)
+            print("       llm git-commit config --prompt <style>  (set as default)", file=out)
+            click.echo(out.getvalue(), nl=False)
             return
 
         #  Check if inside a Git repository
-        if not _is_git_repository():
+        git_ctx = _probe_git_context()
+        if not git_ctx.inside_work_tree:
             click.echo(click.style("Error: Not inside a git repository.", fg="red"))
             return
 
+        # Resolve max_chars up front; _get_git_diff caps (and truncates) the diff while reading it
+        max_chars = max_chars_override or config.get("max-chars") or DEFAULT_MAX_CHARS
+
         #  Get Git diff
-        diff_output, diff_description = _get_git_diff(diff_mode)
+        diff_output, diff_description = _get_git_diff(diff_mode, max_chars)
 
         if diff_output is None: # Error occurred in _get_git_diff
             return
 
-        if not diff_output.strip():
+        # Set when "stage all" is deferred to 'git commit -a' instead of a separate 'git add'
+        stage_all_then_commit = False
+
+        # git diff prints nothing at all when there are no changes, so a plain
+        # emptiness test suffices; .strip() would copy a large diff just to check it
+        if not diff_output:
             if diff_mode == "staged":
                 click.echo("No staged changes found.")
-                _show_git_status()
-                if click.confirm("Do you want to stage all changes and commit?", default=True):
+                status_output = _show_git_status()
+                # Clean tree: there's nothing for 'git add .' to stage either. This relies on
+                # _show_git_status forcing --untracked-files=normal (status.showUntrackedFiles=no
+                # would hide new files) and --no-branch (status.branch=true would add a '##' line)
+                if status_output == "":
+                    return
+                if not click.confirm("Do you want to stage all changes and commit?", default=True):
+                    click.echo("Commit aborted.")
+                    return
+                # With nothing staged, nothing untracked, and 'git add .' covering the whole
+                # repo (run from the top level), staging everything is exactly what
+                # 'git commit -a' does, and 'git diff HEAD' is the diff it will commit.
+                if (status_output is not None
+                        and not any(line.startswith("??") for line in status_output.splitlines())
+                        and git_ctx.at_toplevel):
+                    stage_all_then_commit = True
+                    diff_output, _ = _get_git_diff("tracked", max_chars)
+                    diff_description = "all changes in tracked files"
+                    if diff_output is None:
+                        return
+                    if not diff_output:
+                        click.echo(click.style("No changes to commit.", fg="yellow"))
+                        return
+                else:
                     click.echo("Staging all changes...")
                     try:
-                        subprocess.run(["git", "add", "."], check=True, cwd=".")
+                        # --verbose lists each staged path, so an empty result means the
+                        # (already empty) staged diff can't have changed and needn't be rerun
+                        # Only checked for emptiness, so kept as bytes rather than decoded
+                        add_process = _git_run(
+                            ["add", "--verbose", "."], check=True, stdout=subprocess.PIPE
+                        )
                         click.echo(click.style("Changes staged.", fg="green"))
-                        diff_output, diff_description = _get_git_diff("staged")
-                        if diff_output is None or not diff_output.strip():
+                        if add_process.stdout.strip():
+                            diff_output, diff_description = _get_git_diff("staged", max_chars)
+                        if diff_output is None or not diff_output:
                             click.echo(click.style("No changes to commit even after staging.", fg="yellow"))
                             return
                     except (subprocess.CalledProcessError, FileNotFoundError) as e:
                         click.echo(click.style(f"Error staging changes: {e}", fg="red"))
                         return
-                else:
-                    click.echo("Commit aborted.")
-                    return
             else: # diff_mode is "tracked"
                 click.echo(f"No {diff_description} to commit.")
                 _show_git_status()
@@ -480,12 +722,6 @@ def register_commands(cli):
                 click.echo(f"Set via 'llm keys set {model_obj.needs_key}', --key option, or ${model_obj.key_env_var}.")
                 return
 
-        # --- Truncate diff using the resolved max_chars value ---
-        max_chars = max_chars_override or config.get("max-chars") or DEFAULT_MAX_CHARS
-        if len(diff_output) > max_chars:
-            click.echo(click.style(f"Warning: Diff is very long ({len(diff_output)} chars), truncating to {max_chars} chars for LLM.", fg="yellow"))
-            diff_output = diff_output[:max_chars] + "\n\n... [diff truncated]"
-
         # --- Logic to determine the system prompt with config precedence ---
         try:
             system_prompt = get_system_prompt(config, prompt_style, system_prompt_override)
@@ -535,13 +771,13 @@ def register_commands(cli):
             # CLI override takes precedence
             if editor_override:
                 if editor_override == "env":
-                    editor_mode, editor_cmd = "env", get_editor_from_env()
+                    editor_mode, editor_cmd = "env", get_editor_from_env(git_ctx)
                 elif editor_override == "internal":
                     editor_mode, editor_cmd = "internal", None
                 else:
                     editor_mode, editor_cmd = "command", editor_override
             else:
-                editor_mode, editor_cmd = resolve_editor(config)
+                editor_mode, editor_cmd = resolve_editor(config, git_ctx=git_ctx)
 
             if editor_mode == "internal":
                 final_message = _interactive_edit_message(generated_message, diff_output, model_obj)
@@ -557,7 +793,7 @@ def register_commands(cli):
             click.echo("Commit aborted.")
             return
         
-        _execute_git_commit(final_message, diff_mode == "tracked")
+        _execute_git_commit(final_message, diff_mode == "tracked" or stage_all_then_commit, push, show_status)
 
     # --- 'config' subcommand attached to the git_commit_command group ---
     @git_commit_command.command(name="config")
@@ -568,7 +804,7 @@ def register_commands(cli):
                   help="Set the default prompt style (e.g., conventional, detailed, custom).")
     @click.option("-e", "--editor", "editor_config", default=None,
                   help="Set editor: 'internal' (built-in), 'env' (from environment), or a command.")
-    @click.option("--max-chars", "max_chars_config", type=int, default=None, help="Set the default max characters.")
+    @click.option("--max-chars", "max_chars_config", type=click.IntRange(min=1), default=None, help="Set the default max characters (UTF-8 bytes) of the diff.")
     @click.option("--usage/--no-usage", "usage_config", default=None,
                   help="Enable/disable token usage display by default.")
     @click.option("--show-prompt", is_flag=True, help="Show the full text of the current prompt.")
@@ -607,45 +843,47 @@ def register_commands(cli):
         no_options = not any([reset, model_config, prompt_config,
                               editor_config, max_chars_config, usage_config is not None, show_prompt])
         if view or no_options:
-            click.echo(click.style("llm-git-commit configuration\n", bold=True))
-            click.echo(f"Config file:    {CONFIG_FILE}")
-            click.echo(f"Prompts dir:    {PROMPTS_DIR}")
-            click.echo("")
+            out = io.StringIO()
+            print(click.style("llm-git-commit configuration\n", bold=True), file=out)
+            print(f"Config file:    {CONFIG_FILE}", file=out)
+            print(f"Prompts dir:    {PROMPTS_DIR}", file=out)
+            print(file=out)
 
             # Model
             model = config_data.get("model", "(llm default)")
-            click.echo(f"Model:          {model}")
+            print(f"Model:          {model}", file=out)
 
             # Prompt
             prompt_name = config_data.get("prompt", DEFAULT_PROMPT_STYLE)
             desc = BUILTIN_PROMPT_STYLES.get(prompt_name, f"Custom: {prompt_name}")
             prompt_file = PROMPTS_DIR / f"{prompt_name}.txt"
-            click.echo(f"Prompt:         {prompt_name} - {desc}")
-            click.echo(f"Prompt file:    {prompt_file}")
+            print(f"Prompt:         {prompt_name} - {desc}", file=out)
+            print(f"Prompt file:    {prompt_file}", file=out)
 
             # Editor
             editor_config = config_data.get("editor", "internal")
             env_editor = get_editor_from_env()
             if editor_config == "internal":
-                click.echo(f"Editor:         internal (built-in prompt_toolkit)")
+                print(f"Editor:         internal (built-in prompt_toolkit)", file=out)
             elif editor_config == "env":
-                click.echo(f"Editor:         env -> {env_editor or '(not found, will use internal)'}")
+                print(f"Editor:         env -> {env_editor or '(not found, will use internal)'}", file=out)
             else:
-                click.echo(f"Editor:         {editor_config}")
+                print(f"Editor:         {editor_config}", file=out)
             if env_editor:
-                click.echo(f"Env editor:     {env_editor}")
+                print(f"Env editor:     {env_editor}", file=out)
 
             # Max chars
             max_chars = config_data.get("max-chars", DEFAULT_MAX_CHARS)
-            click.echo(f"Max chars:      {max_chars}")
+            print(f"Max chars:      {max_chars}", file=out)
 
             # Usage
             usage_enabled = config_data.get("usage", False)
-            click.echo(f"Show usage:     {usage_enabled}")
+            print(f"Show usage:     {usage_enabled}", file=out)
 
-            click.echo("")
-            click.echo("Use --show-prompt to see the full prompt text.")
-            click.echo(f"Edit prompt files directly in: {PROMPTS_DIR}")
+            print(file=out)
+            print("Use --show-prompt to see the full prompt text.", file=out)
+            print(f"Edit prompt files directly in: {PROMPTS_DIR}", file=out)
+            click.echo(out.getvalue(), nl=False)
             return
 
         if show_prompt:
@@ -677,7 +915,7 @@ def register_commands(cli):
 
         if prompt_config is not None:
             # Validate the prompt file exists
-            if not get_prompt_content(prompt_config):
+            if not _prompt_exists(prompt_config):
                 prompt_file = PROMPTS_DIR / f"{prompt_config}.txt"
                 click.echo(click.style(f"Error: Prompt '{prompt_config}' not found.", fg="red"))
                 click.echo(f"Create a prompt file at: {prompt_file}")
@@ -727,69 +965,118 @@ def register_commands(cli):
 
 # --- Helper Functions  ---
 
+# Display labels for chat roles, so formatting history doesn't re-capitalize every turn
+_ROLE_LABEL = {"user": "User", "assistant": "Assistant", "system": "System"}
+
 def _format_chat_history_for_prompt(chat_history: list) -> str: 
     """Formats chat history for inclusion in a prompt."""
     if not chat_history:
         return "No conversation history yet."
-    return "\n".join([f"{msg['role'].capitalize()}: {msg['content']}" for msg in chat_history])
+    return "\n".join([f"{_ROLE_LABEL.get(msg['role']) or msg['role'].capitalize()}: {msg['content']}" for msg in chat_history])
 
-def _is_git_repository():
-    """Checks if the current directory is part of a git repository."""
-    try:
-        subprocess.run(
-            ["git", "rev-parse", "--is-inside-work-tree"],
-            check=True, capture_output=True, text=True, cwd=".",
-            encoding="utf-8", errors="ignore"
-        )
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+def _get_git_diff(diff_mode, max_chars=None):
+    """Gets the git diff output based on the specified mode.
 
-def _get_git_diff(diff_mode):
-    """Gets the git diff output based on the specified mode."""
-    diff_command = ["git", "diff"]
+    If max_chars is given, the diff is capped at that many bytes: git is
+    stopped once the cap is exceeded, only the kept prefix is decoded, and
+    a truncation note is appended for the LLM.
+    """
+    diff_args = ["diff"]
     if diff_mode == "staged":
-        diff_command.append("--staged")
+        diff_args.append("--staged")
         description = "staged changes"
     elif diff_mode == "tracked":
-        diff_command.append("HEAD")
+        diff_args.append("HEAD")
         description = "unstaged changes in tracked files"
     else:
         click.echo(click.style(f"Internal error: Unknown diff mode '{diff_mode}'.", fg="red"))
         return None, "unknown changes"
         
-    try:
-        process = subprocess.run(
-            diff_command, capture_output=True, text=True, check=True, cwd=".",
-            encoding="utf-8", errors="ignore"
-        )
-        return process.stdout, description
-    except subprocess.CalledProcessError as e:
-        click.echo(click.style(f"Error getting git diff ({' '.join(diff_command)}):\n{e.stderr or e.stdout}", fg="red"))
-        return None, description
-    except FileNotFoundError:
-        click.echo(click.style("Error: 'git' command not found. Is Git installed and in your PATH?", fg="red"))
-        return None, description
+    # stderr is spooled to a file: only stdout is read while git runs, and a
+    # pipe would stall git once enough warnings (e.g. line-ending ones) fill it
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            process = subprocess.Popen(
+                [_git_executable(), *diff_args], stdout=subprocess.PIPE, stderr=stderr_file,
+                close_fds=False, env=_git_env()
+            )
+        except FileNotFoundError:
+            click.echo(click.style("Error: 'git' command not found. Is Git installed and in your PATH?", fg="red"))
+            return None, description
+
+        with process:
+            diff_bytes = process.stdout.read(-1 if max_chars is None else max_chars + 1)
+            if max_chars is not None and len(diff_bytes) > max_chars:
+                # We have all we'll use; don't make git produce the rest
+                process.terminate()
+                click.echo(click.style(f"Warning: Diff is longer than {max_chars} bytes, truncating for LLM.", fg="yellow"))
+                # A multi-byte character split by the cut is dropped by errors="ignore"
+                diff_output = diff_bytes[:max_chars].decode("utf-8", errors="ignore")
+                return diff_output + "\n\n... [diff truncated]", description
+
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            error_output = (stderr_file.read() or diff_bytes).decode("utf-8", errors="ignore")
+            click.echo(click.style(f"Error getting git diff (git {' '.join(diff_args)}):\n{error_output}", fg="red"))
+            return None, description
+    return diff_bytes.decode("utf-8", errors="ignore"), description
 
 
 def _show_git_status():
-    """Shows a brief git status."""
+    """Shows a brief git status.
+
+    Returns the status text (empty if clean), or None if it couldn't be read.
+    """
     try:
-        status_output = subprocess.check_output(
-            ["git", "status", "--short"], text=True, cwd=".",
-            encoding="utf-8", errors="ignore"
-        ).strip()
+        status_output = _git_run(
+            # Colour and the '##' branch line are forced off so callers can parse the lines,
+            # and untracked files are always listed (status.showUntrackedFiles=no would hide
+            # them) so '??' is reliable
+            ["-c", "color.status=false", "status", "--short", "--no-branch", "--untracked-files=normal"], check=True,
+            stdout=subprocess.PIPE, text=True, encoding="utf-8", errors="ignore"
+        ).stdout.strip()
         if status_output:
             click.echo("\nCurrent git status (--short):")
             click.echo(status_output)
         else:
             click.echo("Git status is clean (no changes detected by 'git status --short').")
+        return status_output
     except (subprocess.CalledProcessError, FileNotFoundError):
         click.echo(click.style("Could not retrieve git status.", fg="yellow"))
+        return None
+
+
+# prompt_toolkit is imported lazily, so its styles can't be module constants;
+# they're parsed on first use and then reused for the rest of the process
+_PROMPT_STYLE_RULES = {
+    "edit": {'instruction': 'ansicyan'},
+    "chat_input": {'prompt': 'fg:ansimagenta'},
+    "confirm": {'prompt': 'bold fg:ansiyellow'},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _prompt_style(name: str) -> Style:
+    """The prompt_toolkit Style for _PROMPT_STYLE_RULES[name], built once."""
+    from prompt_toolkit.styles import Style
+    return Style.from_dict(_PROMPT_STYLE_RULES[name])
+
+
+@functools.lru_cache(maxsize=None)
+def _chat_input_style(base_style: Style) -> Style:
+    """base_style with the chat input prompt rules layered on top, built once per base."""
+    from prompt_toolkit.styles import Style
+    return Style(list(base_style.style_rules) + list(_prompt_style("chat_input").style_rules))
 
 
 def _interactive_edit_message(suggestion: str, original_diff: str, model_obj: llm.Model):
     """Allows interactive editing of the commit message."""
+    from prompt_toolkit import PromptSession # For interactive editing
+    from prompt_toolkit.patch_stdout import patch_stdout # Important for prompt_toolkit
+    from prompt_toolkit.formatted_text import FormattedText
+    from prompt_toolkit.shortcuts import print_formatted_text
+    from prompt_toolkit.key_binding import KeyBindings
+
     click.echo(click.style("\nSuggested commit message (edit below):", fg="cyan"))
     
     prompt_instructions_text = """\
@@ -802,9 +1089,7 @@ Type/edit your commit message below.
 
 Commit Message:
 """
-    custom_style = Style.from_dict({
-        'instruction': 'ansicyan' 
-    })
+    custom_style = _prompt_style("edit")
 
     formatted_instructions = FormattedText([
         ('class:instruction', prompt_instructions_text)
@@ -860,16 +1145,21 @@ Commit Message:
         )
     return edited_message
 
-def _execute_git_commit(message, commit_all_tracked):
-    """Executes the git commit command."""
-    commit_command = ["git"]
+def _execute_git_commit(message, commit_all_tracked, push=None, show_status=False):
+    """Executes the git commit command.
+
+    push answers the post-commit "push?" question up front; None asks.
+    show_status prints 'git status --short' once the commit has succeeded.
+    """
+    commit_command = []
     action_description = "Committing"
 
+    # The message is fed on stdin (-F -) rather than argv, avoiding length limits and quoting issues
     if commit_all_tracked:
-        commit_command.extend(["commit", "-a", "-m", message])
+        commit_command.extend(["commit", "-a", "-F", "-"])
         action_description = "Staging all tracked file changes and committing"
     else: # Staged changes
-        commit_command.extend(["commit", "-m", message])
+        commit_command.extend(["commit", "-F", "-"])
         action_description = "Committing staged changes"
         
     click.echo(f"\n{action_description} with message:")
@@ -880,8 +1170,8 @@ def _execute_git_commit(message, commit_all_tracked):
         return
 
     try:
-        process = subprocess.run(
-            commit_command, capture_output=True, text=True, check=True, cwd=".",
+        process = _git_run(
+            commit_command, input=message, capture_output=True, text=True, check=True,
             encoding="utf-8", errors="ignore"
         )
         click.echo(click.style("\nCommit successful!", fg="green"))
@@ -892,20 +1182,23 @@ def _execute_git_commit(message, commit_all_tracked):
             click.echo("Git stderr:")
             click.echo(process.stderr)
 
-        if click.confirm("Do you want to push the changes?", default=False):
+        if push is None:
+            push = click.confirm("Do you want to push the changes?", default=False)
+        if push:
             click.echo("Pushing changes...")
             try:
-                subprocess.run(
-                    ["git", "push"], check=True, cwd=".",
-                    capture_output=True, text=True, encoding="utf-8", errors="ignore"
-                )
+                # Output is only shown on failure, so it's captured as bytes and decoded there
+                _git_run(["push"], check=True, capture_output=True)
                 click.echo(click.style("Push successful!", fg="green"))
             except subprocess.CalledProcessError as e:
                 click.echo(click.style(f"\nError during git push:", fg="red"))
-                output = (e.stdout or "") + (e.stderr or "")
+                output = ((e.stdout or b"") + (e.stderr or b"")).decode("utf-8", errors="replace")
                 click.echo(output if output else "No output from git push.")
             except FileNotFoundError:
                 click.echo(click.style("Error: 'git' command not found.", fg="red"))
+
+        if show_status:
+            _show_git_status()
             
     except subprocess.CalledProcessError as e:
         click.echo(click.style("\nError during git commit:", fg="red"))
@@ -921,11 +1214,21 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
     - Ctrl+A or /apply: Uses the current working draft, confirms, and exits.
     - LLM proposals (via markers) get a Y/N prompt to update the current working draft.
     """
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.patch_stdout import patch_stdout
+    from prompt_toolkit.formatted_text import FormattedText
+    from prompt_toolkit.shortcuts import print_formatted_text
+    from prompt_toolkit.key_binding import KeyBindings
 
     # Helper for printing FormattedText using the passed style sheet
     def print_styled(text_parts_tuples, end='\n'):
         print_formatted_text(FormattedText(text_parts_tuples), style=passed_style, end=end)
 
+    # Render a multi-line block with one print_formatted_text call instead of one per line
+    def print_lines(text, style_class='class:instruction'): # 'instruction' from passed_style is cyan
+        print_formatted_text(FormattedText([(style_class, line + '\n') for line in text.splitlines()]),
+                             style=passed_style, end='')
+
     # --- Bottom Toolbar Definition ---
     def get_bottom_toolbar_ft():
         return FormattedText([
@@ -938,8 +1241,7 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
     print_styled([('class:dim', "LLM considers original diff & the initial draft context.")]) # Uses 'dim' from passed_style
 
     print_styled([('bold fg:ansiyellow', f"\nReference: Initial Draft (when chat started):")])
-    for line in initial_commit_draft.splitlines():
-        print_styled([('class:instruction', line)]) # Uses 'instruction' from passed_style for cyan
+    print_lines(initial_commit_draft)
     print_formatted_text("---", style=passed_style)
 
     chat_history = []
@@ -947,12 +1249,20 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
     # Stores the text of the last proposal from markers, cleared after Y/N or Ctrl+A action on it.
     last_marker_proposal_text = None 
     
+    # The diff half of CHAT_REFINEMENT_SYSTEM_PROMPT_TEMPLATE is fixed for the whole chat, so format
+    # it once and only splice in the current draft; the result is reused while the draft is unchanged.
+    prompt_head, prompt_tail = CHAT_REFINEMENT_SYSTEM_PROMPT_TEMPLATE.split("{current_draft_for_llm_context}")
+    prompt_head = prompt_head.format(original_diff=original_diff)
+    prompt_tail = prompt_tail.format()
+    cached_prompt_draft = None
+    cached_system_prompt = ""
+
     def get_current_chat_system_prompt():
-        # Use the CHAT_REFINEMENT_SYSTEM_PROMPT_TEMPLATE defined globally
-        return CHAT_REFINEMENT_SYSTEM_PROMPT_TEMPLATE.format(
-            original_diff=original_diff,
-            current_draft_for_llm_context=message_being_refined_in_chat
-        )
+        nonlocal cached_prompt_draft, cached_system_prompt
+        if cached_prompt_draft is not message_being_refined_in_chat:
+            cached_system_prompt = prompt_head + message_being_refined_in_chat + prompt_tail
+            cached_prompt_draft = message_being_refined_in_chat
+        return cached_system_prompt
 
     # KeyBindings for the chat input session
     chat_kb = KeyBindings()
@@ -961,8 +1271,7 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
         print_styled([('fg:ansicyan', "\n(Ctrl+A pressed, initiating apply sequence...)")])
         event.app.exit(result="/apply") # Make the prompt return "/apply"
 
-    chat_input_prompt_style_dict = {'prompt': 'fg:ansimagenta'}
-    effective_chat_session_style = Style(list(passed_style.style_rules) + list(Style.from_dict(chat_input_prompt_style_dict).style_rules))
+    effective_chat_session_style = _chat_input_style(passed_style)
 
     chat_session = PromptSession(
         message=FormattedText([('class:prompt', "Your Query: ")]),
@@ -971,13 +1280,23 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
         key_bindings=chat_kb # Attach keybindings
     )
     
-    confirm_prompt_style_dict = {'prompt': 'bold fg:ansiyellow'}
-    confirm_session_style = Style.from_dict(confirm_prompt_style_dict)
+    confirm_session_style = _prompt_style("confirm")
+    # One session serves every Y/n confirmation; each prompt_async() call supplies its own message
+    confirm_session = PromptSession(style=confirm_session_style)
+    apply_confirm_prompt_ft = FormattedText([('class:prompt', "Use this message & exit chat? (Y/n): ")])
+    proposal_confirm_prompt_ft = FormattedText([('class:prompt', "Accept this proposal as current draft? (Y/n): ")])
+
+    # The draft object last rendered at the top of the loop; holding the reference
+    # (rather than an id()) keeps the identity check sound
+    displayed_draft = None
 
     while True:
-        print_styled([('bold fg:ansiyellow', f"\nCurrent Draft being refined in chat:")])
-        for line in message_being_refined_in_chat.splitlines():
-            print_styled([('class:instruction', line)]) # Uses 'instruction' for cyan
+        if message_being_refined_in_chat is displayed_draft:
+            print_styled([('class:dim', "\n(draft unchanged)")])
+        else:
+            print_styled([('bold fg:ansiyellow', f"\nCurrent Draft being refined in chat:")])
+            print_lines(message_being_refined_in_chat)
+            displayed_draft = message_being_refined_in_chat
         print_formatted_text("---", style=passed_style)
 
         user_input_from_prompt = ""
@@ -992,12 +1311,14 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
         
         cleaned_user_query = user_input_from_prompt.strip() 
         
-        if not cleaned_user_query and user_input_from_prompt != "/apply":
-            cleaned_user_query = "/cancel"
+        if not cleaned_user_query:
+            # Nothing to send: cancel before building any echo or LLM request
             print_styled([('class:dim', "(Empty input treated as /cancel)")])
+            print_styled([('bold fg:ansiyellow', "\nChat cancelled. Returning original draft.")])
+            return initial_commit_draft
 
         if cleaned_user_query.lower() != "/apply" or user_input_from_prompt == "/apply":
-             print_styled([('bold fg:ansiblue', "You: "), ('fg:ansiwhite', cleaned_user_query if cleaned_user_query else "(Action via Keybinding / Empty)")])
+             print_styled([('bold fg:ansiblue', "You: "), ('fg:ansiwhite', cleaned_user_query)])
 
         if cleaned_user_query.lower() == "/cancel":
             print_styled([('bold fg:ansiyellow', "\nChat cancelled. Returning original draft.")])
@@ -1015,15 +1336,12 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
                 continue 
 
             print_styled([('fg:ansigreen', "This is the current draft that will be applied:")])
-            for line in final_message_to_apply.splitlines():
-                print_styled([('class:instruction', line)]) # Show current draft styled cyan
+            print_lines(final_message_to_apply) # Show current draft styled cyan
             print_formatted_text("---", style=passed_style)
             
-            confirm_prompt_ft = FormattedText([('class:prompt', "Use this message & exit chat? (Y/n): ")])
             confirmation = ""
             with patch_stdout():
-                temp_session = PromptSession(message=confirm_prompt_ft, style=confirm_session_style)
-                confirmation = await temp_session.prompt_async()
+                confirmation = await confirm_session.prompt_async(apply_confirm_prompt_ft)
 
             if confirmation.lower().strip() == 'y' or not confirmation.strip(): # Default Y
                 print_styled([('bold fg:ansigreen', "--- Current draft confirmed. Returning to editor. ---")])
@@ -1041,6 +1359,7 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
             
             extracted_proposal_text = None
             llm_full_response_text = ""
+            llm_response_stripped = "" # llm_full_response_text.strip(), computed once per turn
             conversational_parts_to_print = []
             conversational_text_for_history_if_proposal_rejected = ""
             # Don't clear last_marker_proposal_text here; user might type a new query before Ctrl+A for previous proposal
@@ -1057,42 +1376,38 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
                      llm_full_response_text = response_obj
                 else: 
                      llm_full_response_text = str(response_obj)
+                llm_response_stripped = llm_full_response_text.strip()
 
                 print_styled([('bold fg:ansigreen', "LLM:")]) # LLM Prefix
-                if not llm_full_response_text.strip():
+                if not llm_response_stripped:
                     print_styled([('class:dim', "(LLM returned no text)")])
                     conversational_text_for_history_if_proposal_rejected = "" # Explicitly empty
                 else:
-                    start_marker_idx = llm_full_response_text.find(PROPOSED_COMMIT_MARKER_START)
-                    end_marker_idx = -1
-                    if start_marker_idx != -1:
-                        end_marker_idx = llm_full_response_text.find(PROPOSED_COMMIT_MARKER_END, start_marker_idx + len(PROPOSED_COMMIT_MARKER_START))
+                    marker_match = _MARKER_RE.search(llm_full_response_text)
 
-                    if start_marker_idx != -1 and end_marker_idx != -1:
-                        conv_before = llm_full_response_text[:start_marker_idx].strip()
+                    if marker_match:
+                        conv_before = llm_full_response_text[:marker_match.start()].strip()
                         if conv_before: conversational_parts_to_print.append(conv_before)
                         
-                        proposal_start_content_idx = start_marker_idx + len(PROPOSED_COMMIT_MARKER_START)
-                        temp_extracted = llm_full_response_text[proposal_start_content_idx:end_marker_idx].strip()
+                        temp_extracted = marker_match.group(1)
                         if temp_extracted: 
                              extracted_proposal_text = temp_extracted
                              last_marker_proposal_text = extracted_proposal_text # Available for Ctrl+A
                         else: # Markers present but empty content
                              last_marker_proposal_text = None 
                         
-                        conv_after = llm_full_response_text[end_marker_idx + len(PROPOSED_COMMIT_MARKER_END):].strip()
+                        conv_after = llm_full_response_text[marker_match.end():].strip()
                         if conv_after: conversational_parts_to_print.append(conv_after)
                         
                         conversational_text_for_history_if_proposal_rejected = "\n".join(filter(None, [conv_before, conv_after])).strip()
                     else: 
-                        conversational_parts_to_print.append(llm_full_response_text.strip())
-                        conversational_text_for_history_if_proposal_rejected = llm_full_response_text.strip()
+                        conversational_parts_to_print.append(llm_response_stripped)
+                        conversational_text_for_history_if_proposal_rejected = llm_response_stripped
                         last_marker_proposal_text = None # No valid proposal this turn
 
                     for part in conversational_parts_to_print:
                         if part:
-                            for line in part.splitlines():
-                                print_formatted_text(FormattedText([('', line)]), style=passed_style, end='\n')
+                            print_lines(part, style_class='')
             
             except Exception as e:
                 print_styled([('fg:ansired', f"\nLLM Error: {e}")])
@@ -1106,15 +1421,12 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
             if extracted_proposal_text:
                 print_formatted_text("---", style=passed_style) 
                 print_styled([('bold fg:ansiyellow', "LLM Proposes Update to Draft:")])
-                for line in extracted_proposal_text.splitlines():
-                    print_styled([('class:instruction', line)])
+                print_lines(extracted_proposal_text)
                 print_formatted_text("---", style=passed_style)
 
-                confirm_prompt_ft = FormattedText([('class:prompt', "Accept this proposal as current draft? (Y/n): ")])
                 acceptance = ""
                 with patch_stdout():
-                    temp_session = PromptSession(message=confirm_prompt_ft, style=confirm_session_style)
-                    acceptance = await temp_session.prompt_async()
+                    acceptance = await confirm_session.prompt_async(proposal_confirm_prompt_ft)
 
                 if acceptance.lower().strip() == 'y' or not acceptance.strip():
                     message_being_refined_in_chat = extracted_proposal_text
@@ -1134,7 +1446,7 @@ async def _chat_for_refinement(initial_commit_draft: str, original_diff: str, mo
                  # last_marker_proposal_text remains None or its previous value if user didn't Y/N last turn
 
             # Add the determined assistant response to history
-            if assistant_response_for_history or not llm_full_response_text.strip(): # Add even if empty if LLM returned empty
+            if assistant_response_for_history or not llm_response_stripped: # Add even if empty if LLM returned empty
                 chat_history.append({"role": "assistant", "content": assistant_response_for_history})
             
         print_formatted_text("---", style=passed_style) # End of turn separator